@@ -10,8 +10,12 @@ import threading
 import time
 import sys
 import logging
+import logging.handlers
+import atexit
 import string
 import os
+import select
+import socket
 
 # Optional readline for command history
 try:
@@ -25,17 +29,65 @@ try:
 except ImportError:
     raise ImportError("pyserial is required. Install with: pip install pyserial")
 
+# Per-byte lookup tables for the bin/oct output formats
+_BIN_TAB = [f"{i:08b}" for i in range(256)]
+_OCT_TAB = [f"{i:03o}" for i in range(256)]
+
+
+def _format_ascii(data: bytes) -> str:
+    try:
+        return data.decode("ascii")
+    except UnicodeDecodeError:
+        return "<format-error>"
+
+
+def _format_hex(data: bytes) -> str:
+    return "0x" + data.hex()
+
+
+def _format_bin(data: bytes) -> str:
+    return "0b" + "".join([_BIN_TAB[b] for b in data])
+
+
+def _format_oct(data: bytes) -> str:
+    return "0o" + "".join([_OCT_TAB[b] for b in data])
+
+
+_FIXED_FORMATS = {
+    "ascii": _format_ascii,
+    "hex": _format_hex,
+    "bin": _format_bin,
+    "oct": _format_oct,
+}
+
+# Maps every byte format_auto may show as text to 0, everything else to 1
+_PRINT_MASK = bytes(0 if chr(i) in string.printable else 1 for i in range(256))
+
+# Upper bound on a single write() when send() batches repeats
+_BATCH_BYTES = 4096
+
+# Size of the receive ring between the reader and consumer threads; once
+# the consumer falls this far behind, the reader stops pulling from the port
+_RX_RING_BYTES = 1 << 20
+
+# Linux-only; None elsewhere, where send() skips corking
+_TCP_CORK = getattr(socket, "TCP_CORK", None)
+
+# The spam loop flushes the console after this many lines, or once this many
+# seconds have passed since the last flush, whichever comes first
+_FLUSH_EVERY = 64
+_FLUSH_INTERVAL = 0.05
+
+
+# Delay suffixes and their multipliers; "ms" must be tried before "s"/"m"
+_DELAY_SUFFIXES = (("ms", 0.001), ("s", 1.0), ("m", 60.0), ("h", 3600.0))
+
 
 def parse_delay(x: str) -> float:
     try:
-        if x.endswith("ms"):
-            return float(x[:-2]) / 1000.0
-        if x.endswith("s"):
-            return float(x[:-1])
-        if x.endswith("m") and not x.endswith("ms"):
-            return float(x[:-1]) * 60.0
-        if x.endswith("h"):
-            return float(x[:-1]) * 3600.0
+        for suffix, mul in _DELAY_SUFFIXES:
+            if x.endswith(suffix):
+                return float(x[: -len(suffix)]) * mul
         return float(x) / 1000.0
     except ValueError:
         raise argparse.ArgumentTypeError(f"Invalid time value: {x}")
@@ -114,20 +166,81 @@ def parse_args():
     )
 
 
+# Last formatted second, shared by every thread that stamps output; kept as
+# one tuple so a reader always sees a second and its string together
+_ts_cache = (0, "")
+
+
+def _timestamp(now_s: int) -> str:
+    # strftime only runs when the wall-clock second changes
+    global _ts_cache
+    cached_s, ts = _ts_cache
+    if now_s != cached_s:
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now_s))
+        _ts_cache = (now_s, ts)
+    return ts
+
+
+def _console_writer():
+    # Write encoded lines straight to stdout's byte buffer, skipping print()'s
+    # per-call formatting and line-buffered flush; fall back to the text
+    # stream when stdout has no buffer (e.g. replaced by an IDE). With no
+    # stdout at all (pythonw, daemons), output is dropped like print() does.
+    if sys.stdout is None:
+        return (lambda data: None), (lambda: None)
+    sys.stdout.flush()
+    buf = getattr(sys.stdout, "buffer", None)
+    if buf is not None:
+        return buf.write, buf.flush
+    return (
+        lambda data: sys.stdout.write(data.decode("utf-8", "replace")),
+        sys.stdout.flush,
+    )
+
+
+# Writes the same "asctime<sep>message" lines as the logging Formatter, but
+# appends them straight to a buffered file instead of building a LogRecord
+class _RawLogger:
+    def __init__(self, path, sep):
+        self._buf = open(path, "ab", buffering=65536)
+        self._sep = sep.encode("ascii")
+        atexit.register(self.flush)
+
+    def info(self, msg):
+        now = time.time()
+        now_s = int(now)
+        prefix = _timestamp(now_s).encode("ascii")
+        ms = b",%03d" % int((now - now_s) * 1000)
+        self._buf.write(prefix + ms + self._sep + msg.encode("ascii") + b"\n")
+
+    def flush(self):
+        if not self._buf.closed:
+            self._buf.flush()
+
+    def close(self):
+        atexit.unregister(self.flush)
+        self._buf.close()
+
+
 def setup_logger(path, fmt):
     logger = logging.getLogger("serial_comm")
     logger.setLevel(logging.INFO)
     if not path:
         return None
+    # plain/csv lines need no escaping, so they skip the logging machinery
     if fmt == "csv":
-        fmt_str = "%(asctime)s,%(message)s"
-    elif fmt == "json":
-        fmt_str = '{"timestamp":"%(asctime)s","msg":"%(message)s"}'
-    else:
-        fmt_str = "%(asctime)s - %(message)s"
+        return _RawLogger(path, ",")
+    if fmt != "json":
+        return _RawLogger(path, " - ")
+    fmt_str = '{"timestamp":"%(asctime)s","msg":"%(message)s"}'
     fh = logging.FileHandler(path)
     fh.setFormatter(logging.Formatter(fmt_str))
-    logger.addHandler(fh)
+    # Buffer records in memory so a spam loop doesn't hit the disk per message
+    mh = logging.handlers.MemoryHandler(
+        capacity=512, flushLevel=logging.ERROR, target=fh
+    )
+    atexit.register(mh.flush)
+    logger.addHandler(mh)
     return logger
 
 
@@ -144,20 +257,68 @@ class SerialCommunicator:
         log_format="plain",
         no_log_sent=False,
         verbose=False,
+        coalesce_us=500,
+        cpu_affinity=None,
+        realtime=False,
     ):
-        self._ser = serial.Serial(
-            port=port,
+        # serial_for_url also accepts pyserial URLs such as socket://host:port
+        self._ser = serial.serial_for_url(
+            port,
             baudrate=baudrate,
             parity=parity,
             stopbits=stopbits,
             bytesize=bytesize,
-            timeout=0.1,
+            timeout=None,
         )
         self.out_format = out_format
         self.logger = setup_logger(log_file, log_format)
         self.log_sent = not no_log_sent
         self.verbose = verbose
+        self.coalesce_us = coalesce_us
+        self.cpu_affinity = cpu_affinity
+        self.realtime = realtime
+        self._echo, self._echo_flush = _console_writer()
         self._stop_event = threading.Event()
+        # Stop signal close() raises to wake a reader blocked in select(): an
+        # eventfd where available (Linux, Python 3.10+), else a self-pipe
+        self._stop_r = self._stop_w = None
+        if hasattr(os, "eventfd"):
+            self._stop_r = self._stop_w = os.eventfd(0, os.EFD_CLOEXEC)
+        elif os.name == "posix":
+            self._stop_r, self._stop_w = os.pipe()
+        # On POSIX, read/write the port's fd directly; pyserial is kept for
+        # configuration and control lines
+        self._fd = None
+        if self._stop_r is not None:
+            try:
+                self._fd = self._ser.fileno()
+            except (AttributeError, OSError):
+                pass
+        self._write = self._ser.write if self._fd is None else self._write_fd
+        # Ports read through pyserial that can't be woken by cancel_read()
+        # (e.g. rfc2217://) poll with a short timeout so close() isn't stuck
+        if self._fd is None and not hasattr(self._ser, "cancel_read"):
+            self._ser.timeout = 0.1
+        # Network-backed ports (socket://, rfc2217://) expose their TCP socket
+        self._sock = getattr(self._ser, "_socket", None)
+        if self._sock is not None:
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    @property
+    def out_format(self):
+        return self._out_format
+
+    @out_format.setter
+    def out_format(self, fmt):
+        # Resolve the output formatter once per change instead of dispatching
+        # on every chunk
+        self._out_format = fmt
+        if fmt == "autodetect":
+            self._apply_format = self.format_auto
+        else:
+            self._apply_format = _FIXED_FORMATS.get(
+                fmt, lambda data: "<unsupported-format>"
+            )
 
     @staticmethod
     def encode(msg: str) -> bytes:
@@ -177,74 +338,329 @@ class SerialCommunicator:
 
     @staticmethod
     def format_fixed(data: bytes, fmt: str) -> str:
+        formatter = _FIXED_FORMATS.get(fmt)
+        if formatter is None:
+            return "<unsupported-format>"
         try:
-            if fmt == "ascii":
-                return data.decode("ascii")
-            if fmt == "hex":
-                return "0x" + data.hex()
-            if fmt == "bin":
-                return "0b" + "".join(f"{b:08b}" for b in data)
-            if fmt == "oct":
-                return "0o" + "".join(f"{b:03o}" for b in data)
+            return formatter(data)
         except Exception:
             return "<format-error>"
-        return "<unsupported-format>"
 
     @staticmethod
     def format_auto(data: bytes) -> str:
-        try:
-            s = data.decode("ascii")
-            if all(c in string.printable for c in s):
-                return s
-        except Exception:
-            pass
-        return "0x" + data.hex()
+        if 1 in data.translate(_PRINT_MASK):
+            return "0x" + data.hex()
+        return data.decode("ascii")
 
-    def _apply_format(self, data: bytes) -> str:
-        if self.out_format != "autodetect":
-            return self.format_fixed(data, self.out_format)
-        return self.format_auto(data)
+    def _write_fd(self, data: bytes):
+        fd = self._fd
+        view = memoryview(data)
+        while view:
+            try:
+                n = os.write(fd, view)
+            except BlockingIOError:
+                # pyserial opens the port non-blocking; wait for room
+                select.select([], [fd], [])
+                continue
+            except InterruptedError:
+                continue
+            except OSError as e:
+                raise SerialException(f"write failed: {e}")
+            view = view[n:]
+
+    def _tune_reader_thread(self):
+        # Called from the reader thread itself; pid 0 means the calling thread
+        if self.cpu_affinity is not None and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, {self.cpu_affinity})
+            except (OSError, ValueError) as e:
+                print(f"Warning: could not pin reader to CPU: {e}", file=sys.stderr)
+        if self.realtime and hasattr(os, "sched_setscheduler"):
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(50))
+            except (OSError, ValueError) as e:
+                print(f"Warning: could not enable SCHED_FIFO: {e}", file=sys.stderr)
 
     def start_reader(self):
+        fd = self._fd
+        stopped = self._stop_event.is_set
+
+        # Both readers return the number of bytes read into buf, or -1 once
+        # close() has been called.
+
+        def blocking_read_into(buf):
+            # Blocks in pyserial until at least one byte arrives, then drains
+            # whatever else is already buffered.
+            if stopped():
+                return -1
+            room = len(buf)
+            data = self._ser.read(min(self._ser.in_waiting or 1, room))
+            waiting = min(self._ser.in_waiting, room - len(data))
+            if data and waiting:
+                data += self._ser.read(waiting)
+            buf[: len(data)] = data
+            return len(data)
+
+        stop_r = self._stop_r
+        fds = [fd, stop_r]
+        wait = select.select
+        readv = os.readv if fd is not None else None
+
+        def select_read_into(buf):
+            # Waits in the kernel on the port and the stop fd together, then
+            # reads straight into the ring without an intermediate bytes object.
+            # The stop fd is the only shutdown check on this path.
+            r, _, _ = wait(fds, [], [])
+            if stop_r in r and fd in fds:
+                # Take what the port already has, then only wait on stop_r,
+                # which returns at once on the next call
+                fds.remove(fd)
+            if fd not in r:
+                return -1
+            try:
+                n = readv(fd, [buf])
+            except (BlockingIOError, InterruptedError):
+                return 0
+            except OSError as e:
+                raise SerialException(f"read failed: {e}")
+            if not n:
+                raise SerialException(
+                    "device reports readiness to read but returned no data "
+                    "(device disconnected or multiple access on port?)"
+                )
+            return n
+
+        read_into = blocking_read_into if fd is None else select_read_into
+
+        # The reader thread only moves bytes from the port into a fixed ring
+        # buffer; formatting, printing and logging happen on the consumer
+        # thread so a slow terminal or disk can't stall reads from the port.
+        # head/tail count bytes written/consumed and only ever grow; each is
+        # written by one thread only, which the GIL keeps consistent.
+        size = _RX_RING_BYTES
+        ring = memoryview(bytearray(size))
+        head = tail = 0
+        reader_done = False
+        rx_ready = threading.Event()
+        rx_space = threading.Event()
+
         def reader():
-            while not self._stop_event.is_set():
-                waiting = self._ser.in_waiting
-                if waiting:
-                    data = self._ser.read(waiting)
-                    out = self._apply_format(data).rstrip("\r\n")
-                    if not out:
+            nonlocal head, reader_done
+            notify = rx_ready.set
+            space_wait = rx_space.wait
+            space_clear = rx_space.clear
+            try:
+                self._tune_reader_thread()
+                while True:
+                    free = size - (head - tail)
+                    if not free:
+                        # Consumer is a full ring behind; let the kernel buffer
+                        space_wait(0.1)
+                        space_clear()
+                        if stopped():
+                            break
+                        continue
+                    start = head % size
+                    n = read_into(ring[start : start + min(free, size - start)])
+                    if n < 0:
+                        break
+                    if n:
+                        head += n
+                        notify()
+            finally:
+                reader_done = True
+                notify()
+
+        def consumer():
+            nonlocal tail
+            # Bind everything the loop touches to locals up front
+            wait = rx_ready.wait
+            clear = rx_ready.clear
+            space_notify = rx_space.set
+            log = self.logger
+            verbose = self.verbose
+            echo = self._echo
+            echo_flush = self._echo_flush
+            now = time.time
+            monotonic = time.monotonic
+            timestamp = _timestamp
+            coalesce = self.coalesce_us / 1e6
+            pending = bytearray()
+            deadline = 0.0
+
+            def emit(data):
+                # Looked up per message so a change to out_format applies
+                # to a running reader
+                out = self._apply_format(data).rstrip("\r\n")
+                if not out:
+                    return
+                ts = timestamp(int(now()))
+                if verbose:
+                    echo(f"[{ts}] REC RAW: 0x{data.hex()}\n".encode())
+                echo(f"[{ts}] REC: {out}\n".encode("utf-8", "replace"))
+                if log:
+                    log.info(f"RECV,{data.hex()}")
+
+            # Chunks are coalesced until a newline arrives or coalesce_us has
+            # passed since the first one, so a message split across several
+            # reads is printed and logged once.
+            while True:
+                avail = head - tail
+                if not avail:
+                    if reader_done:
+                        if head == tail:
+                            break
                         continue
-                    ts = time.strftime("%Y-%m-%d %H:%M:%S")
-                    if self.verbose:
-                        print(f"[{ts}] REC RAW: 0x{data.hex()}")
-                    print(f"[{ts}] REC: {out}")
-                    if self.logger:
-                        self.logger.info(f"RECV,{data.hex()}")
-                else:
-                    time.sleep(0.1)
+                    # Idle: push out whatever has been printed so far
+                    echo_flush()
+                    if not pending:
+                        wait()
+                    elif not wait(max(0.0, deadline - monotonic())):
+                        emit(bytes(pending))
+                        pending.clear()
+                    clear()
+                    continue
+                start = tail % size
+                end = min(start + avail, size)
+                if not pending:
+                    deadline = monotonic() + coalesce
+                seen = len(pending)
+                pending += ring[start:end]
+                tail += end - start
+                space_notify()
+                cut = pending.rfind(b"\n", seen) + 1
+                if cut:
+                    # Emit complete lines only; a partial line after the last
+                    # newline waits for the rest with a fresh deadline
+                    emit(bytes(pending[:cut]))
+                    del pending[:cut]
+                    deadline = monotonic() + coalesce
+                elif monotonic() >= deadline:
+                    emit(bytes(pending))
+                    pending.clear()
+            if pending:
+                emit(bytes(pending))
+            echo_flush()
 
+        self._consumer_thread = threading.Thread(target=consumer, daemon=True)
+        self._consumer_thread.start()
         self._thread = threading.Thread(target=reader, daemon=True)
         self._thread.start()
 
-    def send(self, payload: bytes, count=1, delay=0.0):
+    def send(self, payload: bytes, count=1, delay=0.0, batch=False):
+        # Cork network ports during back-to-back repeats so the kernel packs
+        # them into full segments instead of one per write
+        cork = (
+            self._sock is not None
+            and _TCP_CORK is not None
+            and delay == 0.0
+            and count != 1
+        )
+        if cork:
+            self._sock.setsockopt(socket.IPPROTO_TCP, _TCP_CORK, 1)
+        try:
+            if batch and delay == 0.0 and payload:
+                self._send_batched(payload, count)
+            else:
+                self._send_repeated(payload, count, delay)
+        finally:
+            self._echo_flush()
+            if cork:
+                self._sock.setsockopt(socket.IPPROTO_TCP, _TCP_CORK, 0)
+
+    def _send_repeated(self, payload: bytes, count, delay):
         i = 0
         infinite = count < 0
+        # The payload never changes, so format it once and bind the rest of
+        # what the loop touches to locals
+        write = self._write
+        sleep = time.sleep
+        now = time.time
+        out = self._apply_format(payload)
+        raw = payload.hex()
+        verbose = self.verbose
+        log = self.logger if self.log_sent else None
+        echo = self._echo
+        echo_flush = self._echo_flush
+        # Flush before a line would sit unflushed past _FLUSH_INTERVAL
+        # (counting the sleep ahead), so slow spam still shows each line as
+        # it is sent while millisecond-rate spam is flushed in batches
+        flushed_i = 0
+        flushed_at = now()
+        last_ts_s = 0
+        line = b""
         while infinite or i < count:
-            self._ser.write(payload)
-            ts = time.strftime("%Y-%m-%d %H:%M:%S")
-            out = self._apply_format(payload)
-            if self.verbose:
-                print(f"[{ts}] SEND RAW: 0x{payload.hex()}")
-            print(f"[{ts}] SEND: {out}")
-            if self.logger and self.log_sent:
-                self.logger.info(f"SENT,{payload.hex()}")
+            write(payload)
+            # Only rebuild the console line when the wall-clock second changes
+            t = now()
+            now_s = int(t)
+            if now_s != last_ts_s:
+                ts = _timestamp(now_s)
+                text = f"[{ts}] SEND: {out}\n"
+                if verbose:
+                    text = f"[{ts}] SEND RAW: 0x{raw}\n" + text
+                line = text.encode("utf-8", "replace")
+                last_ts_s = now_s
+            echo(line)
+            if log:
+                log.info(f"SENT,{raw}")
             i += 1
-            time.sleep(delay)
+            if (
+                i - flushed_i >= _FLUSH_EVERY
+                or t + delay - flushed_at >= _FLUSH_INTERVAL
+            ):
+                echo_flush()
+                flushed_i = i
+                flushed_at = t
+            sleep(delay)
+
+    def _send_batched(self, payload: bytes, count):
+        # Repeat the payload into one buffer of up to _BATCH_BYTES and write
+        # it in one call, printing and logging a single line per batch.
+        per_batch = max(1, _BATCH_BYTES // len(payload))
+        bulk = payload * per_batch
+        # As in _send_repeated, format the payload once and bind to locals
+        write = self._write
+        now = time.time
+        out = self._apply_format(payload)
+        raw = payload.hex()
+        verbose = self.verbose
+        log = self.logger if self.log_sent else None
+        echo = self._echo
+        remaining = count
+        infinite = count < 0
+        while infinite or remaining > 0:
+            n = per_batch if infinite else min(per_batch, remaining)
+            write(bulk if n == per_batch else payload * n)
+            ts = _timestamp(int(now()))
+            if verbose:
+                echo(f"[{ts}] SEND RAW x{n}: 0x{raw}\n".encode())
+            echo(f"[{ts}] SEND x{n}: {out}\n".encode("utf-8", "replace"))
+            if log:
+                log.info(f"SENT x{n},{raw}")
+            remaining -= n
 
     def close(self):
         self._stop_event.set()
+        # Wake the reader out of its blocking wait; an eventfd needs exactly
+        # one 8-byte counter increment, which a pipe accepts just as well
+        if self._stop_w is not None:
+            os.write(self._stop_w, (1).to_bytes(8, sys.byteorder))
+        if hasattr(self._ser, "cancel_read"):
+            self._ser.cancel_read()
         if hasattr(self, "_thread"):
             self._thread.join(timeout=1)
+            self._consumer_thread.join(timeout=1)
+        if self._stop_w is not None:
+            os.close(self._stop_r)
+            if self._stop_w != self._stop_r:
+                os.close(self._stop_w)
+            self._stop_r = self._stop_w = None
+        if isinstance(self.logger, _RawLogger):
+            self.logger.close()
+        elif self.logger:
+            for handler in self.logger.handlers:
+                handler.flush()
         self._ser.close()
 
 